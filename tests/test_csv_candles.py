@@ -0,0 +1,143 @@
+import tempfile
+import unittest
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from trading_helpers.schemas import _Candle, _Candles, CandleInterval
+from trading_helpers.csv_candles import _CSVCandles
+
+
+@dataclass(frozen=True, slots=True)
+class Candle(_Candle):
+    pass
+
+
+class Candles(_Candles):
+    HOLIDAYS = frozenset()
+
+
+class CSVCandles(_CSVCandles):
+    CANDLE = Candle
+    CANDLES = Candles
+    COLUMNS = {
+        'open': float,
+        'high': float,
+        'low': float,
+        'close': float,
+        'volume': int,
+        'dt': datetime.fromisoformat,
+    }
+
+    @classmethod
+    def convert_candle_interval(cls, interval: CandleInterval) -> CandleInterval:
+        return CandleInterval(interval)
+
+    @classmethod
+    async def download_or_read(cls, *args, **kwargs) -> Candles:
+        raise NotImplementedError
+
+
+HEADER = 'open;high;low;close;volume;dt'
+ROWS = [
+    '1.0;2.0;0.5;1.25;10;2024-01-01 00:00:00+00:00',
+    '1.25;2.0;1.0;1.5;20;2024-01-02 00:00:00+00:00',
+    '1.5;2.5;1.25;2.0;30;2024-01-03 00:00:00+00:00',
+]
+FROM = datetime.fromisoformat('2024-01-01 00:00:00+00:00')
+TO = datetime.fromisoformat('2024-01-03 00:00:00+00:00')
+
+
+class TestReadLineEnds(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        CSVCandles.DIR_API = Path(self.tmp_dir.name)
+        self.csv = CSVCandles('TEST', CandleInterval.DAY)
+        self.csv.filepath.parent.mkdir(parents=True)
+
+    async def read(self, data: bytes) -> Candles:
+        self.csv.filepath.write_bytes(data)
+        return await self.csv._read(FROM, TO, CandleInterval.DAY)
+
+    async def test_lf(self):
+        candles = await self.read(('\n'.join([HEADER, *ROWS]) + '\n').encode())
+        self.assertEqual([c.close for c in candles], [1.25, 1.5, 2.0])
+
+    async def test_crlf(self):
+        candles = await self.read(('\r\n'.join([HEADER, *ROWS]) + '\r\n').encode())
+        self.assertEqual([c.close for c in candles], [1.25, 1.5, 2.0])
+        self.assertEqual(candles[-1].dt, TO)
+
+    async def test_crlf_followed_by_lf_rows(self):
+        candles = await self.read(('\r\n'.join([HEADER, *ROWS[:2]]) + '\r\n' + ROWS[2] + '\n').encode())
+        self.assertEqual([c.close for c in candles], [1.25, 1.5, 2.0])
+        self.assertEqual([c.dt.day for c in candles], [1, 2, 3])
+
+
+class KeywordCandle:
+    def __init__(self, *, open, high, low, close, volume, dt):
+        self.close, self.dt = close, dt
+
+
+class KeywordCSVCandles(CSVCandles):
+    CANDLE = KeywordCandle
+
+
+class TestCandleArgs(unittest.IsolatedAsyncioTestCase):
+    def test_subclass_with_non_dataclass_candle_uses_keywords(self):
+        self.assertIsNotNone(CSVCandles._CANDLE_ARGS)
+        self.assertIsNone(KeywordCSVCandles._CANDLE_ARGS)
+
+    async def test_read_with_non_dataclass_candle(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            KeywordCSVCandles.DIR_API = Path(tmp_dir)
+            csv = KeywordCSVCandles('TEST', CandleInterval.DAY)
+            csv.filepath.parent.mkdir(parents=True)
+            csv.filepath.write_text('\n'.join([HEADER, *ROWS]) + '\n')
+            candles = await csv._read(FROM, TO, CandleInterval.DAY)
+
+        self.assertEqual([c.close for c in candles], [1.25, 1.5, 2.0])
+
+
+class CachedCSVCandles(CSVCandles):
+    CACHE_READS = True
+
+
+class OtherCachedCSVCandles(CSVCandles):
+    CACHE_READS = True
+
+
+class TestReadCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        for cls in (CachedCSVCandles, OtherCachedCSVCandles):
+            cls.DIR_API = Path(self.tmp_dir.name)
+            cls.clear_read_cache()
+        self.csv = CachedCSVCandles('TEST', CandleInterval.DAY)
+        self.csv.filepath.parent.mkdir(parents=True)
+        self.csv.filepath.write_text('\n'.join([HEADER, *ROWS]) + '\n')
+
+    async def test_reads_of_different_ranges_share_one_entry(self):
+        first = await self.csv._read(FROM, TO, CandleInterval.DAY)
+        second = await self.csv._read(FROM, FROM, CandleInterval.DAY)
+
+        self.assertEqual([c.close for c in first], [1.25, 1.5, 2.0])
+        self.assertEqual([c.close for c in second], [1.25])
+        self.assertIsInstance(second, Candles)
+        info = CachedCSVCandles._read_file.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    async def test_caches_are_per_class(self):
+        await self.csv._read(FROM, TO, CandleInterval.DAY)
+        await OtherCachedCSVCandles('TEST', CandleInterval.DAY)._read(FROM, TO, CandleInterval.DAY)
+        OtherCachedCSVCandles.clear_read_cache()
+
+        self.assertEqual(CachedCSVCandles._read_file.cache_info().currsize, 1)
+        self.assertEqual(OtherCachedCSVCandles._read_file.cache_info().currsize, 0)
+        self.assertEqual(CSVCandles._read_file.cache_info().currsize, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,16 @@
+import asyncio
+import functools
+import mmap
+import os
+import shutil
 from abc import ABC, abstractmethod
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import TypeVar, Callable, ClassVar
+from bisect import bisect_left, bisect_right
+from dataclasses import fields, is_dataclass
+from itertools import starmap
+from operator import attrgetter
+from typing import TypeVar, Callable, ClassVar, Iterator
 
 import aiofiles
 
@@ -12,21 +21,47 @@ from trading_helpers.schemas import (
 )
 from trading_helpers.exceptions import (
     CSVCandlesNeedAppend,
-    CSVCandlesNeedInsert,
 )
 
 
 Interval = TypeVar('Interval')
 
+# how old the last candle of today may be before the file needs an append
+INTERVAL_MAX_DELTA = {
+    CandleInterval.MIN_1: timedelta(minutes=1+1),
+    CandleInterval.MIN_5: timedelta(minutes=5+1),
+    CandleInterval.HOUR: timedelta(minutes=60+1),
+}
+
 
 class _CSVCandles(ABC):
     DELIMITER = ';'
     NEW_LINE = '\n'
+    CHUNK_SIZE = 64 * 1024
 
     CANDLE = ClassVar[AnyCandle]
     CANDLES = ClassVar[AnyCandles]
     COLUMNS: dict[str, Callable]
     DIR_API: Path
+    # reuse parsed rows of unchanged files across reads, see _read_cached for how a change is detected
+    CACHE_READS: ClassVar[bool] = False
+    # files kept per class, each one whole, so several indicators over several instruments fit
+    READ_CACHE_SIZE: ClassVar[int] = 32
+    # COLUMNS in the positional order of CANDLE fields, if rows can be passed to CANDLE positionally
+    _CANDLE_ARGS: ClassVar[tuple[str, ...] | None] = None
+    _read_file: ClassVar[Callable[[Path, int, int], tuple[tuple[datetime, ...], tuple[AnyCandle, ...]]]]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # each API class gets its own cache, so instruments of one don't evict those of another
+        cls._read_file = staticmethod(functools.lru_cache(maxsize=cls.READ_CACHE_SIZE)(cls._parse_file))
+        # set on every class, so a CANDLE swapped in by a child never runs with its parent's positional order
+        cls._CANDLE_ARGS = None
+        if not hasattr(cls, 'COLUMNS') or not is_dataclass(cls.CANDLE):
+            return
+
+        args = tuple(f.name for f in fields(cls.CANDLE) if f.init)[:len(cls.COLUMNS)]
+        cls._CANDLE_ARGS = args if set(args) == set(cls.COLUMNS) else None
 
     def __init__(self, instrument_id: str, interval: Interval | CandleInterval):
         self.instrument_id = instrument_id
@@ -47,53 +82,144 @@ class _CSVCandles(ABC):
         return (self.DIR_API / self.interval / self.instrument_id).with_suffix('.csv')
 
     async def _read(self, from_: datetime, to: datetime, interval: CandleInterval) -> AnyCandles:
-        candles = self.CANDLES()
-
-        async with aiofiles.open(self.filepath, 'r') as f:
-            data = await f.readlines()
-
-        for i, row in enumerate(data[1:], start=1):
-            str_values = row.replace(self.NEW_LINE, '').split(self.DELIMITER)
-            candle_dict = {c: self.COLUMNS[c](v) for c, v in zip(self.COLUMNS, str_values)}
-            candle = self.CANDLE(**candle_dict)
-
-            if from_ <= candle.dt <= to:
-                candles.append(candle)
-
-            if i == 0 and candle.dt > from_:
-                if not (interval == CandleInterval.DAY and candle.dt.date() == from_.date()):
-                    raise CSVCandlesNeedInsert(to_temp=candle.dt)
-            if i == len(data) - 1 and candle.dt < to:
-                dt_delta = to - candle.dt
-                if ((
-                        candle.dt.date() == to.date() and
-                        interval == CandleInterval.MIN_1 and dt_delta > timedelta(minutes=1+1) or
-                        interval == CandleInterval.MIN_5 and dt_delta > timedelta(minutes=5+1) or
-                        interval == CandleInterval.HOUR and dt_delta > timedelta(minutes=60+1)
-                ) or candle.dt.date() < to.date()):
-                    raise CSVCandlesNeedAppend(from_temp=candle.dt, candles=candles)
+        read = self._read_cached if self.CACHE_READS else self._read_chunks
+        return await asyncio.to_thread(read, self.filepath, from_, to, interval)
+
+    @classmethod
+    def clear_read_cache(cls) -> None:
+        cls._read_file.cache_clear()
+
+    @classmethod
+    def _read_cached(cls, filepath: Path, from_: datetime, to: datetime, interval: CandleInterval) -> AnyCandles:
+        # a file is taken as unchanged while its mtime and size are, which holds for _append and _insert,
+        # but a same-size rewrite within one mtime tick is missed, so edit files elsewhere only with clear_read_cache()
+        stat = os.stat(filepath)
+        dts, rows = cls._read_file(filepath, stat.st_mtime_ns, stat.st_size)
+        candles = cls.CANDLES(rows[bisect_left(dts, from_):bisect_right(dts, to)])
+        if dts:
+            cls._check_need_append(dts[-1], to, interval, candles)
+        return candles
+
+    @classmethod
+    def _parse_file(
+            cls, filepath: Path, mtime_ns: int, size: int
+    ) -> tuple[tuple[datetime, ...], tuple[AnyCandle, ...]]:
+        # mtime_ns and size only key _read_file, the whole file is cached once whatever [from_, to] reads ask for
+        all_dts, rows = [], []
+        for dts, columns in cls._iter_columns(filepath):
+            all_dts.extend(dts)
+            rows.extend(cls._columns_to_candles(dts, columns, 0, len(dts)))
+        return tuple(all_dts), tuple(rows)
+
+    @classmethod
+    def _read_chunks(cls, filepath: Path, from_: datetime, to: datetime, interval: CandleInterval) -> AnyCandles:
+        candles = cls.CANDLES()
+        last_dt = None
+
+        for dts, columns in cls._iter_columns(filepath):
+            # rows are sorted by time, so [from_, to] is one contiguous slice
+            candles.extend(cls._columns_to_candles(dts, columns, bisect_left(dts, from_), bisect_right(dts, to)))
+
+            last_dt = dts[-1]
+            if last_dt > to:
+                # the rest of the file is past `to`, and the last candle is too, so no append is needed
+                break
+
+        if last_dt is not None:
+            cls._check_need_append(last_dt, to, interval, candles)
         return candles
 
+    @classmethod
+    def _check_need_append(cls, last_dt: datetime, to: datetime, interval: CandleInterval, candles: AnyCandles) -> None:
+        if last_dt < to:
+            max_delta = INTERVAL_MAX_DELTA.get(interval)
+            if (
+                    last_dt.date() == to.date() and max_delta is not None and to - last_dt > max_delta or
+                    last_dt.date() < to.date()
+            ):
+                raise CSVCandlesNeedAppend(from_temp=last_dt, candles=candles)
+
+    @classmethod
+    def _iter_columns(cls, filepath: Path) -> Iterator[tuple[list[datetime], dict[str, list[str]]]]:
+        delimiter, new_line, converters = cls.DELIMITER, cls.NEW_LINE, cls.COLUMNS
+        n = len(converters)
+
+        for chunk in cls._iter_text_chunks(filepath):
+            # split the whole chunk with one scan, row k's values then sit at [k*n : (k+1)*n]
+            body = chunk.rstrip(new_line)
+            if not body:
+                continue
+            tokens = body.replace(new_line, delimiter).split(delimiter)
+            columns = {c: tokens[k::n] for k, c in enumerate(converters)}
+
+            # only the time column is needed to filter rows, the rest is converted by _columns_to_candles
+            yield list(map(converters['dt'], columns.pop('dt'))), columns
+
+    @classmethod
+    def _columns_to_candles(
+            cls, dts: list[datetime], columns: dict[str, list[str]], lo: int, hi: int
+    ) -> Iterator[AnyCandle]:
+        converters = cls.COLUMNS
+        values = {c: map(converters[c], v[lo:hi]) for c, v in columns.items()}
+        values['dt'] = dts[lo:hi]
+        if cls._CANDLE_ARGS is not None:
+            return starmap(cls.CANDLE, zip(*map(values.get, cls._CANDLE_ARGS)))
+        return (cls.CANDLE(**dict(zip(values, row))) for row in zip(*values.values()))
+
+    @classmethod
+    def _iter_text_chunks(cls, filepath: Path) -> Iterator[str]:
+        # rows after the header, about CHUNK_SIZE bytes at a time and always cut at a row end
+        with open(filepath, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                row_end = cls.NEW_LINE.encode()
+                start = mm.find(row_end) + len(row_end)
+                while len(row_end) <= start < len(mm):
+                    end = mm.find(row_end, start + cls.CHUNK_SIZE)
+                    end = len(mm) if end == -1 else end + len(row_end)
+                    text = str(mm[start:end], 'utf-8')
+                    # files written in text mode on Windows before all writers used LF still hold CRLF rows
+                    yield text.replace('\r\n', cls.NEW_LINE) if '\r' in text else text
+                    start = end
+
     async def _append(self, candles: AnyCandles) -> None:
         if not candles:
             return
 
-        data = self.NEW_LINE.join(
-            self.DELIMITER.join(str(c.__dict__[k]) for k in self.COLUMNS) for c in candles
-        ) + self.NEW_LINE
+        # formatting thousands of rows is CPU work, so it runs next to the write instead of on the event loop
+        await asyncio.to_thread(self._append_serialized, candles)
 
-        async with aiofiles.open(self.filepath, 'a') as f:
-            await f.write(data)
+    def _append_serialized(self, candles: AnyCandles) -> None:
+        with open(self.filepath, 'a', encoding='utf-8', newline='') as f:
+            f.write(self._serialize(candles))
 
     async def _insert(self, candles: AnyCandles):
-        async with aiofiles.open(self.filepath, 'r') as f:
-            data = await f.readlines()
+        await asyncio.to_thread(self._rewrite_with_leading, candles)
+
+    def _rewrite_with_leading(self, candles: AnyCandles) -> None:
+        # old rows are streamed after the new ones into a sibling file, which then replaces the original,
+        # so the file is never held in memory and is left untouched if writing fails
+        tmp_filepath = self.filepath.with_suffix('.tmp')
+
+        try:
+            with open(self.filepath, 'rb') as src, open(tmp_filepath, 'wb') as dst:
+                src.readline()
+                header = self.DELIMITER.join(self.COLUMNS) + self.NEW_LINE
+                dst.write((header + self._serialize(candles)).encode('utf-8'))
+                shutil.copyfileobj(src, dst, self.CHUNK_SIZE)
+            os.replace(tmp_filepath, self.filepath)
+        except BaseException:
+            tmp_filepath.unlink(missing_ok=True)
+            raise
+
+    def _serialize(self, candles: AnyCandles) -> str:
+        if not candles:
+            return ''
 
-        await self._prepare_new()
-        await self._append(candles)
-        async with aiofiles.open(self.filepath, 'a') as f:
-            await f.writelines(data[1:])
+        get_values, join_values = attrgetter(*self.COLUMNS), self.DELIMITER.join
+        return self.NEW_LINE.join([join_values(map(str, get_values(c))) for c in candles]) + self.NEW_LINE
 
     async def _prepare_new(self):
-        async with aiofiles.open(self.filepath, 'w') as f:
+        async with aiofiles.open(self.filepath, 'w', encoding='utf-8', newline='') as f:
             await f.write(self.DELIMITER.join(self.COLUMNS) + self.NEW_LINE)
@@ -1,12 +1,22 @@
 from abc import ABC
 from dataclasses import dataclass
 from datetime import datetime, date
-from collections import UserList
 from enum import StrEnum, auto
-from typing import Self, Literal, TypeVar
+from itertools import islice, pairwise, starmap
+from typing import Self, Literal, TypeVar, Callable
+import operator
 
 
 MathOperation = Literal['__add__', '__sub__', '__mul__', '__truediv__']
+MATH_OPERATORS: dict[MathOperation, Callable] = {
+    '__add__': operator.add,
+    '__sub__': operator.sub,
+    '__mul__': operator.mul,
+    '__truediv__': operator.truediv,
+}
+
+_list_getitem = list.__getitem__
+_get_candle_dt = operator.attrgetter('dt')
 
 
 class CandleInterval(StrEnum):
@@ -25,7 +35,7 @@ class CandleInterval(StrEnum):
     MONTH = auto()
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class _Candle(ABC):
     open: float
     high: float
@@ -44,63 +54,65 @@ class _Candle(ABC):
             dt=self.dt
         )
 
-    def __add__(self, other: Self) -> Self:
+    def _do_math_operation(self, func_name: MathOperation, other: Self) -> Self:
+        op = MATH_OPERATORS[func_name]
+        # prices go through op while volumes are always summed, positional arguments are cheaper than keywords
         return _Candle(
-            open=self.open + other.open,
-            high=self.high + other.high,
-            low=self.low + other.low,
-            close=self.close + other.close,
-            volume=self.volume + other.volume,
-            dt=self.dt if self.dt >= other.dt else other.dt
+            op(self.open, other.open),
+            op(self.high, other.high),
+            op(self.low, other.low),
+            op(self.close, other.close),
+            self.volume + other.volume,
+            self.dt if self.dt >= other.dt else other.dt
         )
 
-    def __sub__(self, other: Self):
-        return _Candle(
-            open=self.open - other.open,
-            high=self.high - other.high,
-            low=self.low - other.low,
-            close=self.close - other.close,
-            volume=self.volume + other.volume,
-            dt=self.dt if self.dt >= other.dt else other.dt
-        )
+    def __add__(self, other: Self) -> Self:
+        return self._do_math_operation('__add__', other)
 
-    def __mul__(self, other: Self):
-        return _Candle(
-            open=self.open * other.open,
-            high=self.high * other.high,
-            low=self.low * other.low,
-            close=self.close * other.close,
-            volume=self.volume + other.volume,
-            dt=self.dt if self.dt >= other.dt else other.dt
-        )
+    def __sub__(self, other: Self) -> Self:
+        return self._do_math_operation('__sub__', other)
 
-    def __truediv__(self, other: Self):
-        return _Candle(
-            open=self.open / other.open,
-            high=self.high / other.high,
-            low=self.low / other.low,
-            close=self.close / other.close,
-            volume=self.volume + other.volume,
-            dt=self.dt if self.dt >= other.dt else other.dt
-        )
+    def __mul__(self, other: Self) -> Self:
+        return self._do_math_operation('__mul__', other)
+
+    def __truediv__(self, other: Self) -> Self:
+        return self._do_math_operation('__truediv__', other)
+
+
+class _Candles(list[_Candle], ABC):
+    HOLIDAYS: frozenset[date]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # subclasses may set HOLIDAYS as any iterable of dates, lookups in filter() need a set
+        if isinstance(cls.__dict__.get('HOLIDAYS'), (list, tuple, set)):
+            cls.HOLIDAYS = frozenset(cls.HOLIDAYS)
 
+    # like UserList did, slices and copies stay of the same class
+    def __getitem__(self, i):
+        if i.__class__ is slice:
+            return self.__class__(_list_getitem(self, i))
+        return _list_getitem(self, i)
 
-class _Candles(UserList[_Candle], ABC):
-    HOLIDAYS: list[date]
+    def copy(self) -> Self:
+        return self.__class__(self)
 
     def check_datetime_consistency(self) -> None:
         from trading_helpers.exceptions import IncorrectDatetimeConsistency
 
-        for i in range(1, len(self)):
-            if self[i-1].dt > self[i].dt:
-                raise IncorrectDatetimeConsistency(f'Previous candle datetime value later than previous candle has: '
-                                                   f'{self[i-1].dt=} | {self[i].dt=}')
+        # the first pair out of order is found by a C-level scan that stops right there
+        try:
+            i = operator.indexOf(starmap(operator.gt, pairwise(map(_get_candle_dt, self))), True) + 1
+        except ValueError:
+            return
+
+        raise IncorrectDatetimeConsistency(f'Previous candle datetime value later than previous candle has: '
+                                           f'{self[i-1].dt=} | {self[i].dt=}')
 
     def remove_same_candles_in_a_row(self) -> Self:
         new_candles = _Candles()
         c1 = self[0]
-        for i in range(1, len(self)):
-            c2 = self[i]
+        for c2 in islice(self, 1, None):
             if not (c1.open == c2.open and c1.high == c2.high and c1.low == c2.low and
                     c1.close == c2.close and c1.volume == c2.volume and c1.dt != c2.dt):
                 new_candles.append(c1)
@@ -109,43 +121,56 @@ class _Candles(UserList[_Candle], ABC):
         new_candles.append(self[-1])
         return new_candles
 
+    def multiple_by_constant(self, v: int | float) -> Self:
+        return self.__class__(map(operator.methodcaller('multiple_by_constant', v), self))
+
+    def filter(self, *, drop_weekends: bool = True, drop_holidays: bool = True) -> Self:
+        weekend = (5, 6) if drop_weekends else ()
+        holidays = self.HOLIDAYS if drop_holidays else frozenset()
+        return self.__class__([c for c in self if c.dt.weekday() not in weekend and c.dt.date() not in holidays])
+
     def remove_weekend_and_holidays_candles(self) -> Self:
-        candles = [c for c in self if c.dt.weekday() not in (5, 6) and c.dt.date() not in self.HOLIDAYS]
-        return self.__class__(candles)
+        return self.filter()
 
     def remove_weekend_candles(self) -> Self:
-        return self.__class__([c for c in self if c.dt.weekday() not in (5, 6)])
+        return self.filter(drop_holidays=False)
 
     def remove_holidays_candles(self) -> Self:
-        return self.__class__([c for c in self if c.dt.date() not in self.HOLIDAYS])
+        return self.filter(drop_weekends=False)
 
     def _do_math_operation(self, func_name: MathOperation, other: Self) -> Self:
         if len(self) == 0 or len(other) == 0:
             raise Exception(f'One of candles list is empty')
 
+        op = MATH_OPERATORS[func_name]
+        # candles of the same source usually share every timestamp, then there is nothing to align
+        if len(self) == len(other) and list(map(_get_candle_dt, self)) == list(map(_get_candle_dt, other)):
+            return _Candles(map(op, self, other))
+
         candles = _Candles()
+        # plain lists are indexed at C level, unlike _Candles.__getitem__
+        candles1, candles2 = list(self), list(other)
+        n1, n2 = len(candles1), len(candles2)
         i1, i2 = 0, 0
 
-        while True:
-            c1 = self[i1]
-            c2 = other[i2]
+        while i1 < n1 and i2 < n2:
+            c1 = candles1[i1]
+            c2 = candles2[i2]
 
             if c1.dt == c2.dt:
                 i1 += 1
                 i2 += 1
             elif c1.dt > c2.dt:
-                c1 = self[i1 - 1]
+                c1 = candles1[i1 - 1]
                 i2 += 1
             elif c1.dt < c2.dt:
-                c2 = self[i2 - 1]
+                c2 = candles2[i2 - 1]
                 i1 += 1
 
-            c = getattr(c1, func_name)(c2)
-            candles.append(c)
+            candles.append(op(c1, c2))
 
-            if i1 == len(self) or i2 == len(other):
-                assert i1 == len(self) and i2 == len(other), f'{i1=} | {len(self)=} ; {i2=} | {len(other)=}'
-                return candles
+        assert i1 == n1 and i2 == n2, f'{i1=} | {len(self)=} ; {i2=} | {len(other)=}'
+        return candles
 
     def __add__(self, other: Self) -> Self:
         return self._do_math_operation(func_name='__add__', other=other)